@@ -6,32 +6,89 @@ Základní hra s variacemi, jako možnost volby obtížnosti, přihlašování a
 zápis statistik do db JSON
 """
 
+import atexit
+import bisect
+import hashlib
+import hmac
 import json
+import math
+import os
+import re
+import secrets
+import sys
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
+from random import randrange, sample
+
+try:
+    import orjson
+except ImportError:  # orjson není nainstalován - použije se standardní json
+    orjson = None
+
+BANNER = "=" * 40
+SEPARATOR = "_" * 40
+DIFFICULTY_MENU = (
+    f"\n{BANNER}\nSelect difficulty:\n"
+    "1. Easy (3 digits)\n2. Medium (4 digits)\n3. Hard (5 digits)\n"
+    f"{BANNER}\n"
+)
 
 
 class FileManager:
     """
-    Správa souborů - kontrola existence a inicializace souborů.
+    Správa souborů - kontrola existence a inicializace souborů, (de)serializace JSON.
     """
+    @staticmethod
+    def dumps(obj):
+        """Serializuje objekt do kompaktního JSON (bytes), přednostně přes orjson."""
+        if orjson is not None:
+            return orjson.dumps(obj)
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+    @staticmethod
+    def loads(data):
+        """Deserializuje JSON (str nebo bytes), přednostně přes orjson."""
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+
+    @staticmethod
+    def atomic_write(file_path, data):
+        """
+        Zapíše data (bytes) do dočasného souboru a atomicky jím nahradí cílový soubor,
+        takže pád během zápisu nepoškodí původní data.
+        """
+        tmp_path = file_path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
     @staticmethod
     def ensure_file(file_path, default_data):
         """
         Zkontroluje existenci JSON souboru a vytvoří jej, pokud neexistuje.
         """
-        try:
-            with open(file_path, "r") as f:
-                pass
-        except FileNotFoundError:
-            with open(file_path, "w") as f:
-                json.dump(default_data, f, indent=4)
+        if not os.path.exists(file_path):
+            with open(file_path, "wb") as f:
+                f.write(FileManager.dumps(default_data))
 
 
 class UserManager:
     """
     Správa uživatelů - registrace, přihlášení, validace.
     """
+    __slots__ = ("user_file", "users")
+
+    PBKDF2_HASH = "sha256"  # Hashovací funkce PBKDF2-HMAC pro nové hashe hesel
+    PBKDF2_ITERATIONS = 600_000  # Počet iterací PBKDF2 pro nové hashe hesel
+
     def __init__(self, user_file="users.json"):
         self.user_file = user_file
         FileManager.ensure_file(self.user_file, {})
@@ -39,13 +96,30 @@ class UserManager:
 
     def load_users(self):
         """Načte data uživatelů ze souboru."""
-        with open(self.user_file, "r") as f:
-            return json.load(f)
+        with open(self.user_file, "rb") as f:
+            return FileManager.loads(f.read())
 
     def save_users(self):
         """Uloží data uživatelů do souboru."""
-        with open(self.user_file, "w") as f:
-            json.dump(self.users, f, indent=4)
+        FileManager.atomic_write(self.user_file, FileManager.dumps(self.users))
+
+    @staticmethod
+    def _hash_password(password, salt, hash_name, iterations):
+        """Vrátí PBKDF2-HMAC hash hesla se solí (hex)."""
+        return hashlib.pbkdf2_hmac(hash_name, password.encode(), salt.encode(), iterations).hex()
+
+    def _new_credentials(self, password):
+        """
+        Vytvoří záznam hesla s novou solí a aktuálními parametry PBKDF2.
+        Parametry se ukládají k hashi, aby šlo jejich hodnoty později změnit.
+        """
+        salt = secrets.token_hex(8)
+        return {
+            "salt": salt,
+            "pw_hash": self._hash_password(password, salt, self.PBKDF2_HASH, self.PBKDF2_ITERATIONS),
+            "algorithm": f"pbkdf2_{self.PBKDF2_HASH}",
+            "iterations": self.PBKDF2_ITERATIONS,
+        }
 
     def validate_username(self, username):
         """Validuje délku uživatelského jména."""
@@ -68,16 +142,37 @@ class UserManager:
         if not self.validate_password(password):
             print("Password must be at least 6 characters long and include a number.")
             return False
-        self.users[username] = {"password": password, "games": []}
+        self.users[username] = {**self._new_credentials(password), "games": []}
         self.save_users()
         print("Registration successful.")
         return True
 
+    def check_password(self, user, password):
+        """Porovná heslo s uloženým hashem v konstantním čase."""
+        if "pw_hash" not in user:
+            if "password" not in user:
+                return False
+            if not hmac.compare_digest(user["password"].encode(), password.encode()):
+                return False
+            user.update(self._new_credentials(password))
+            del user["password"]
+            self.save_users()
+            return True
+        algorithm = user.get("algorithm", "")
+        if not algorithm.startswith("pbkdf2_"):
+            return False
+        pw_hash = self._hash_password(
+            password, user["salt"], algorithm.removeprefix("pbkdf2_"), user["iterations"]
+        )
+        return hmac.compare_digest(user["pw_hash"], pw_hash)
+
     def log_in(self, username, password):
         """
         Přihlášení uživatele.
+        Účty se starým heslem v prostém textu se při přihlášení převedou na hash.
         """
-        if username in self.users and self.users[username]["password"] == password:
+        user = self.users.get(username)
+        if user is not None and self.check_password(user, password):
             print("Login successful.")
             return True
         print("Invalid username or password.")
@@ -87,69 +182,195 @@ class UserManager:
 class GameStats:
     """
     Správa statistik - ukládání a načítání herních výsledků.
+    Výsledky se připisují jako řádky do NDJSON logu a na disk se zapisují dávkově.
     """
-    def __init__(self, stats_file="stats.json"):
+    __slots__ = ("stats_file", "stats", "_ts_index", "_cache", "_log_fh", "_dirty", "_pending", "_last_flush")
+
+    FLUSH_INTERVAL = 5.0  # Max. počet sekund mezi zápisy na disk
+    FLUSH_THRESHOLD = 16  # Max. počet neuložených výsledků
+
+    def __init__(self, stats_file="stats.ndjson", legacy_file="stats.json"):
         self.stats_file = stats_file
-        FileManager.ensure_file(self.stats_file, {})
+        self.migrate_legacy(legacy_file)
         self.stats = self.load_stats()
+        self._ts_index = self.build_ts_index()
+        self._cache = {}  # (username, days) -> (výsledek get_recent_stats, platnost do)
+        self._log_fh = open(self.stats_file, "ab", buffering=64 * 1024)
+        self._dirty = False
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        atexit.register(self.flush)
+
+    def migrate_legacy(self, legacy_file):
+        """
+        Jednorázově převede starý soubor statistik (JSON) do NDJSON logu.
+        """
+        if os.path.exists(self.stats_file) or not os.path.exists(legacy_file):
+            return
+        with open(legacy_file, "rb") as f:
+            legacy = FileManager.loads(f.read())
+        FileManager.atomic_write(self.stats_file, b"".join(
+            self._encode_record(username, game)
+            for username, games in legacy.items()
+            for game in games
+        ))
+
+    @staticmethod
+    def _encode_record(username, game):
+        """Zakóduje jeden herní výsledek jako řádek NDJSON."""
+        return FileManager.dumps({"user": username, **game}) + b"\n"
 
     def load_stats(self):
-        """Načte statistiky ze souboru."""
-        with open(self.stats_file, "r") as f:
-            return json.load(f)
+        """
+        Načte statistiky z NDJSON logu.
+        Neúplný poslední záznam (např. po pádu během zápisu) se přeskočí a log se
+        zkrátí na poslední celý řádek, poškození uprostřed souboru vyvolá chybu.
+        """
+        stats = {}
+        if not os.path.exists(self.stats_file):
+            return stats
+        with open(self.stats_file, "rb") as f:
+            lines = f.read().splitlines(keepends=True)
+        offset = 0
+        for i, line in enumerate(lines):
+            if line.strip():
+                try:
+                    record = FileManager.loads(line)
+                except ValueError:
+                    if i < len(lines) - 1:
+                        raise
+                    with open(self.stats_file, "r+b") as f:
+                        f.truncate(offset)
+                    break
+                username = record.pop("user")
+                stats.setdefault(username, []).append(record)
+                if not line.endswith(b"\n"):  # Celý záznam bez konce řádku
+                    with open(self.stats_file, "ab") as f:
+                        f.write(b"\n")
+            offset += len(line)
+        return stats
 
-    def save_stats(self):
-        """Uloží statistiky do souboru."""
-        with open(self.stats_file, "w") as f:
-            json.dump(self.stats, f, indent=4)
+    def build_ts_index(self):
+        """
+        Sestaví pro každého hráče seřazený seznam časů her (epoch sekundy),
+        paralelní se seznamem jeho statistik.
+        """
+        return {
+            username: [datetime.fromisoformat(game["timestamp"]).timestamp() for game in games]
+            for username, games in self.stats.items()
+        }
+
+    def flush(self):
+        """Zapíše neuložené statistiky na disk."""
+        if self._dirty:
+            self._log_fh.flush()
+        self._dirty = False
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def _mark_dirty(self):
+        """Označí statistiky jako neuložené a při překročení limitu je zapíše."""
+        self._dirty = True
+        self._pending += 1
+        if (self._pending >= self.FLUSH_THRESHOLD
+                or time.monotonic() - self._last_flush > self.FLUSH_INTERVAL):
+            self.flush()
 
     def add_game_result(self, username, attempts, duration):
         """Přidá herní výsledek uživatele."""
-        now = datetime.now().isoformat()
-        if username not in self.stats:
-            self.stats[username] = []
-        self.stats[username].append({"attempts": attempts, "duration": duration, "timestamp": now})
-        self.save_stats()
+        ts = time.time()
+        now = datetime.fromtimestamp(ts).isoformat()
+        game = {"attempts": attempts, "duration": duration, "timestamp": now}
+        self.stats.setdefault(username, []).append(game)
+        self._ts_index.setdefault(username, []).append(ts)
+        self._cache = {key: value for key, value in self._cache.items() if key[0] != username}
+        self._log_fh.write(self._encode_record(username, game))
+        self._mark_dirty()
 
     def get_recent_stats(self, username, days=0):
         """
         Načte statistiky za poslední dny.
         Pokud days = 0, načte všechny statistiky.
+        Výsledek se ukládá do cache, která se maže při zápisu nové hry hráče
+        a u časového okna také ve chvíli, kdy z něj nejstarší hra vypadne.
+        """
+        key = (username, days)
+        now = time.time()
+        cached = self._cache.get(key)
+        if cached is not None and now < cached[1]:
+            return cached[0]
+        result, valid_until = self._compute_recent_stats(username, days, now)
+        self._cache[key] = (result, valid_until)
+        return result
+
+    def _compute_recent_stats(self, username, days, now):
         """
-        if username not in self.stats:
-            return []
-        stats = self.stats[username]
+        Vybere statistiky hráče za poslední dny bez použití cache.
+        Vrací dvojici (statistiky, čas do kdy výsledek platí).
+        """
+        stats = self.stats.get(username)
+        if stats is None:
+            return [], math.inf
         if days > 0:
-            cutoff = datetime.now() - timedelta(days=days)
-            return [game for game in stats if datetime.fromisoformat(game["timestamp"]) > cutoff]
-        return stats
+            timestamps = self._ts_index[username]
+            start = bisect.bisect_right(timestamps, now - days * 86400)
+            if start < len(timestamps):
+                return stats[start:], timestamps[start] + days * 86400
+            return [], math.inf
+        return stats, math.inf
 
 
 class BullsAndCowsGame:
     """
     Hlavní logika hry Bulls and Cows.
     """
+    __slots__ = ()
+
     @staticmethod
     def generate_secret_number(num_digits):
         """
         Generuje náhodné tajné číslo s unikátními číslicemi.
+        První číslici losuje z 1-9 a zbytek ze zbylých číslic, takže rozložení
+        zůstává rovnoměrné a losování se nikdy neopakuje.
         """
-        from random import sample
-        while True:
-            number = sample(range(10), num_digits)
-            if number[0] != 0:
-                return ''.join(map(str, number))
+        first = randrange(1, 10)
+        rest = sample([d for d in range(10) if d != first], num_digits - 1)
+        return ''.join(map(str, [first] + rest))
 
     @staticmethod
-    def is_valid_guess(guess, num_digits):
-        """Validuje hráčův tip."""
-        return guess.isdigit() and len(guess) == num_digits and len(set(guess)) == len(guess)
+    def is_valid_guess(guess, guess_re):
+        """
+        Validuje hráčův tip a vrací dvojici (platnost, maska číslic tipu).
+        guess_re je předkompilovaný regex pro daný počet číslic, kontrola unikátnosti
+        číslic probíhá v jednom průchodu přes bitovou masku.
+        """
+        if not guess_re.fullmatch(guess):
+            return False, 0
+        mask = 0
+        for c in guess:
+            bit = 1 << (ord(c) - 48)
+            if mask & bit:
+                return False, 0
+            mask |= bit
+        return True, mask
 
     @staticmethod
-    def evaluate_guess(secret, guess):
-        """Vyhodnocuje hráčův tip a počítá bulls a cows."""
+    def _digit_mask(digits):
+        """Vrátí 10bitovou masku číslic obsažených v řetězci (bit i = číslice i)."""
+        mask = 0
+        for c in digits:
+            mask |= 1 << (ord(c) - 48)
+        return mask
+
+    @staticmethod
+    def evaluate_guess(secret, secret_mask, guess, guess_mask):
+        """
+        Vyhodnocuje hráčův tip a počítá bulls a cows.
+        secret_mask je maska číslic tajného čísla, předpočítaná jednou za hru,
+        guess_mask maska číslic tipu získaná při validaci.
+        """
         bulls = sum(s == g for s, g in zip(secret, guess))
-        cows = sum(g in secret for g in guess) - bulls
+        cows = (secret_mask & guess_mask).bit_count() - bulls
         return bulls, cows
 
     def play(self, num_digits):
@@ -157,33 +378,38 @@ class BullsAndCowsGame:
         Hlavní smyčka hry Bulls and Cows.
         """
         secret = self.generate_secret_number(num_digits)
+        secret_mask = self._digit_mask(secret)
+        guess_re = re.compile(rf"[0-9]{{{num_digits}}}")
         attempts = 0
-        start_time = time.time()
-        print(f"\n{'=' * 40}")
-        print(f"A {num_digits}-digit secret number has been generated!")
-        print(f"{'=' * 40}\n")
+        monotonic = time.monotonic  # Měření doby hry nezávislé na změnách systémového času
+        start_time = monotonic()
+        sys.stdout.write(f"\n{BANNER}\nA {num_digits}-digit secret number has been generated!\n{BANNER}\n\n")
 
+        readline, write, flush = sys.stdin.readline, sys.stdout.write, sys.stdout.flush
         while True:
-            guess = input("Enter your guess (or 'q' to quit): ").strip()
-            if guess.lower() == "q":
+            write("Enter your guess (or 'q' to quit): ")
+            flush()
+            line = readline()
+            guess = line.strip()
+            if not line or guess.lower() == "q":  # Konec vstupu (EOF) = ukončení hry
                 print("Thanks for playing!")
                 return None, None
 
-            if not self.is_valid_guess(guess, num_digits):
+            valid, guess_mask = self.is_valid_guess(guess, guess_re)
+            if not valid:
                 print("Invalid guess. Try again.")
                 continue
 
             attempts += 1
-            bulls, cows = self.evaluate_guess(secret, guess)
-            print(f"\n{'_' * 40}")
-            print(f"{bulls} Bulls, {cows} Cows")
-            print(f"{'_' * 40}\n")
+            bulls, cows = self.evaluate_guess(secret, secret_mask, guess, guess_mask)
+            write(f"\n{SEPARATOR}\n{bulls} Bulls, {cows} Cows\n{SEPARATOR}\n\n")
 
             if bulls == num_digits:
-                duration = time.time() - start_time
-                print(f"\n{'=' * 40}")
-                print(f"Congratulations! You guessed the number in {attempts} attempts and {duration:.2f} seconds.")
-                print(f"{'=' * 40}\n")
+                duration = monotonic() - start_time
+                write(
+                    f"\n{BANNER}\nCongratulations! You guessed the number in {attempts} attempts "
+                    f"and {duration:.2f} seconds.\n{BANNER}\n\n"
+                )
                 return attempts, duration
 
 
@@ -191,6 +417,8 @@ class GameManager:
     """
     Hlavní správa hry a interakce s uživatelem.
     """
+    __slots__ = ("user_manager", "game_stats", "game", "difficulty")
+
     def __init__(self):
         self.user_manager = UserManager()
         self.game_stats = GameStats()
@@ -199,12 +427,7 @@ class GameManager:
 
     def set_difficulty(self):
         """Nastavení obtížnosti hry."""
-        print("\n" + "=" * 40)
-        print("Select difficulty:")
-        print("1. Easy (3 digits)")
-        print("2. Medium (4 digits)")
-        print("3. Hard (5 digits)")
-        print("=" * 40)
+        sys.stdout.write(DIFFICULTY_MENU)
         choice = input("Enter your choice (or 'q' to quit): ").strip()
 
         if choice.lower() == "q":
@@ -226,9 +449,7 @@ class GameManager:
 
     def start(self):
         """Spouští hlavní menu hry."""
-        print("\n" + "=" * 40)
-        print("Welcome to Bulls and Cows!")
-        print("=" * 40)
+        sys.stdout.write(f"\n{BANNER}\nWelcome to Bulls and Cows!\n{BANNER}\n")
         while True:
             print("\n1. Log in\n2. Sign up\n3. Play as guest\n4. Quit")
             choice = input("Enter your choice: ").strip()
@@ -255,10 +476,10 @@ class GameManager:
     def main_menu(self, username):
         """Hlavní menu přihlášeného hráče."""
         while True:
-            print(f"\n{'=' * 40}")
-            print(f"Welcome, {username}!")
-            print("1. Play game\n2. View statistics (not available for guests)\n3. Log out")
-            print(f"{'=' * 40}")
+            sys.stdout.write(
+                f"\n{BANNER}\nWelcome, {username}!\n"
+                f"1. Play game\n2. View statistics (not available for guests)\n3. Log out\n{BANNER}\n"
+            )
             choice = input("Enter your choice: ").strip()
 
             if choice == "1":
@@ -270,7 +491,7 @@ class GameManager:
             elif choice == "2":
                 if username == "guest":
                     print("Statistics are not available for guests.")
-                elif len(self.game_stats.get_recent_stats(username)) == 0:
+                elif not self.game_stats.get_recent_stats(username):
                     print("No statistics available. Play a game first!")
                 else:
                     stats = self.game_stats.get_recent_stats(username, days=30)
@@ -279,6 +500,7 @@ class GameManager:
                         print(f"- {game['attempts']} attempts, {game['duration']:.2f} seconds")
             elif choice == "3":
                 print("Logging out...")
+                self.game_stats.flush()
                 break
             else:
                 print("Invalid choice. Try again.")